@@ -1,20 +1,18 @@
 from __future__ import annotations
 
-from functools import partial
-from itertools import count
-from typing import Any, Literal, overload
+from functools import lru_cache
+from typing import Any, Callable, Literal, cast, overload
 
 from vsexprtools import ExprOp, ExprVars, complexpr_available, norm_expr
 from vskernels import Bilinear, Gaussian
 from vstools import (
-    ConvMode, CustomValueError, FunctionUtil, OneDimConvModeT, PlanesT, SpatialConvModeT,
+    ConstantFormatVideoNode, ConvMode, CustomValueError, FunctionUtil, OneDimConvModeT, PlanesT, SpatialConvModeT,
     TempConvModeT, check_variable, core, depth, get_depth, join, normalize_planes, normalize_seq, split, to_arr, vs
 )
 
-from .enum import BlurMatrix, BlurMatrixBase, LimitFilterMode
+from .enum import BlurMatrix, BlurMatrixBase
 from .freqs import MeanMode
-from .limit import limit_filter
-from .util import normalize_radius
+from .util import _planes_mask, normalize_radius
 
 __all__ = [
     'box_blur', 'side_box_blur',
@@ -24,6 +22,23 @@ __all__ = [
 ]
 
 
+@lru_cache(maxsize=256)
+def _kernel_weights(
+    kind: Callable[..., BlurMatrixBase[Any]], taps: int, mode: ConvMode, **kwargs: Any
+) -> tuple[Any, ...]:
+    return tuple(kind(taps, mode=mode, **kwargs))
+
+
+def _get_kernel(
+    kind: Callable[..., BlurMatrixBase[Any]], taps: int, mode: ConvMode, **kwargs: Any
+) -> BlurMatrixBase[Any]:
+    """
+    Returns a BlurMatrix kernel, only computing its weights once for every set of parameters.
+    The weights are cached as a tuple so the returned kernel can't alter the cached ones.
+    """
+    return BlurMatrixBase(_kernel_weights(kind, taps, mode, **kwargs), mode)
+
+
 def box_blur(
     clip: vs.VideoNode, radius: int | list[int] = 1, passes: int = 1,
     mode: OneDimConvModeT | TempConvModeT = ConvMode.HV, planes: PlanesT = None, **kwargs: Any
@@ -35,11 +50,20 @@ def box_blur(
     if isinstance(radius, list):
         return normalize_radius(clip, box_blur, radius, planes, passes=passes)
 
+    return _box_blur(clip, radius, passes, mode, planes, **kwargs)
+
+
+def _box_blur(
+    clip: ConstantFormatVideoNode, radius: int, passes: int,
+    mode: OneDimConvModeT | TempConvModeT, planes: list[int], **kwargs: Any
+) -> vs.VideoNode:
     if not radius:
         return clip
 
-    if mode == ConvMode.TEMPORAL or (clip.format.sample_type == vs.FLOAT and clip.format.bits_per_sample == 16):
-        return BlurMatrix.MEAN(radius, mode=mode)(clip, planes, passes=passes, **kwargs)
+    fp16 = clip.format.sample_type == vs.FLOAT and clip.format.bits_per_sample == 16
+
+    if mode == ConvMode.TEMPORAL or (fp16 and radius <= 12):
+        return _get_kernel(BlurMatrix.MEAN, radius, mode)(clip, planes, passes=passes, **kwargs)
 
     box_args = (
         planes,
@@ -47,82 +71,81 @@ def box_blur(
         radius, 0 if mode == ConvMode.HORIZONTAL else passes
     )
 
+    # std.BoxBlur doesn't support float16, but its running sum beats a big mean convolution
+    if fp16:
+        return depth(depth(clip, 32).std.BoxBlur(*box_args), clip)
+
     if hasattr(core, 'vszip'):
         return clip.vszip.BoxBlur(*box_args)
 
     if radius > 12:
         return clip.std.BoxBlur(*box_args)
 
-    return BlurMatrix.MEAN(radius, mode=mode)(clip, planes, passes=passes, **kwargs)
+    return _get_kernel(BlurMatrix.MEAN, radius, mode)(clip, planes, passes=passes, **kwargs)
+
+
+_EV = tuple(ExprVars[2:26])
+
+
+@lru_cache(maxsize=64)
+def _side_box_expr(n_inter: int, has_comp: bool) -> str:
+    # Keeps the intermediate closest to the source on the stack, only using stack ops so std.Expr can run it too
+    cum_expr = ' '.join(['y', *(f'dup x - abs {new} x - abs < swap {new} ?' for new in _EV[:n_inter - 1])])
+
+    if has_comp:
+        return f'x {cum_expr} - {ExprVars[n_inter + 1]} +'
+
+    return cum_expr
+
+
+@lru_cache(maxsize=64)
+def _half_kernels(radius: int) -> tuple[tuple[int, ...], tuple[int, ...]]:
+    half_kernel = (1, ) * (radius + 1) + (0, ) * radius
+
+    return half_kernel, half_kernel[::-1]
 
 
 def side_box_blur(
     clip: vs.VideoNode, radius: int | list[int] = 1, planes: PlanesT = None,
     inverse: bool = False
 ) -> vs.VideoNode:
+    assert check_variable(clip, side_box_blur)
+
     planes = normalize_planes(clip, planes)
 
     if isinstance(radius, list):
         return normalize_radius(clip, side_box_blur, radius, planes, inverse=inverse)
 
-    half_kernel = [(1 if i <= 0 else 0) for i in range(-radius, radius + 1)]
-
-    conv_m1 = partial(core.std.Convolution, matrix=half_kernel, planes=planes)
-    conv_m2 = partial(core.std.Convolution, matrix=half_kernel[::-1], planes=planes)
-    blur_pt = partial(box_blur, planes=planes)
-
-    vrt_filters, hrz_filters = [
-        [
-            partial(conv_m1, mode=mode), partial(conv_m2, mode=mode),
-            partial(blur_pt, hradius=hr, vradius=vr, hpasses=h, vpasses=v)
-        ] for h, hr, v, vr, mode in [
-            (0, None, 1, radius, ConvMode.VERTICAL), (1, radius, 0, None, ConvMode.HORIZONTAL)
-        ]
-    ]
-
-    vrt_intermediates = (vrt_flt(clip) for vrt_flt in vrt_filters)
-    intermediates = list(
-        hrz_flt(vrt_intermediate)
-        for i, vrt_intermediate in enumerate(vrt_intermediates)
-        for j, hrz_flt in enumerate(hrz_filters) if not i == j == 2
-    )
-
-    comp_blur = None if inverse else box_blur(clip, radius, 1, planes=planes)
-
-    if complexpr_available:
-        template = '{cum} x - abs {new} x - abs < {cum} {new} ?'
+    half_kernel, half_kernel_rev = _half_kernels(radius)
 
-        cum_expr, cumc = '', 'y'
-        n_inter = len(intermediates)
+    vrt_intermediates = cast(list[ConstantFormatVideoNode], [
+        core.std.Convolution(clip, half_kernel, planes=planes, mode=ConvMode.VERTICAL),
+        core.std.Convolution(clip, half_kernel_rev, planes=planes, mode=ConvMode.VERTICAL),
+        _box_blur(clip, radius, 1, ConvMode.VERTICAL, planes)
+    ])
 
-        for i, newc, var in zip(count(), ExprVars[2:26], ExprVars[4:26]):
-            if i == n_inter - 1:
-                break
+    intermediates = list[vs.VideoNode]()
 
-            cum_expr += template.format(cum=cumc, new=newc)
+    for i, vrt_intermediate in enumerate(vrt_intermediates):
+        intermediates.extend([
+            core.std.Convolution(vrt_intermediate, half_kernel, planes=planes, mode=ConvMode.HORIZONTAL),
+            core.std.Convolution(vrt_intermediate, half_kernel_rev, planes=planes, mode=ConvMode.HORIZONTAL)
+        ])
 
-            if i != n_inter - 2:
-                cumc = var.upper()
-                cum_expr += f' {cumc}! '
-                cumc = f'{cumc}@'
+        # Vertical + horizontal box blur would just be a full box blur
+        if i != 2:
+            intermediates.append(_box_blur(vrt_intermediate, radius, 1, ConvMode.HORIZONTAL, planes))
 
-        if comp_blur:
-            clips = [clip, *intermediates, comp_blur]
-            cum_expr = f'x {cum_expr} - {ExprVars[n_inter + 1]} +'
-        else:
-            clips = [clip, *intermediates]
+    comp_blur = None if inverse else _box_blur(clip, radius, 1, ConvMode.HV, planes)
 
-        cum = norm_expr(clips, cum_expr, planes, force_akarin='vsrgtools.side_box_blur')
-    else:
-        cum = intermediates[0]
-        for new in intermediates[1:]:
-            cum = limit_filter(clip, cum, new, LimitFilterMode.SIMPLE2_MIN, planes)
+    clips = [clip, *intermediates, comp_blur] if comp_blur else [clip, *intermediates]
 
-        if comp_blur:
-            cum = clip.std.MakeDiff(cum).std.MergeDiff(comp_blur)
+    cum = cast(ConstantFormatVideoNode, norm_expr(
+        clips, _side_box_expr(len(intermediates), comp_blur is not None), planes, func=side_box_blur
+    ))
 
     if comp_blur:
-        return box_blur(cum, 1, min(radius // 2, 1))
+        return _box_blur(cum, 1, min(radius // 2, 1), ConvMode.HV, planes)
 
     return cum
 
@@ -172,21 +195,42 @@ def gauss_blur(
 
             return Gaussian(sigma, taps).scale(plane, **resize_kwargs | kwargs)
 
-        if not {*range(clip.format.num_planes)} - {*planes}:
+        if _planes_mask(planes) == (1 << clip.format.num_planes) - 1:
             return _resize2_blur(clip, sigma, taps)
 
+        if len(planes) == 1:
+            blurred = _resize2_blur(core.std.ShufflePlanes(clip, planes[0], vs.GRAY), sigma, taps)
+
+            return core.std.ShufflePlanes(
+                [blurred if i == planes[0] else clip for i in range(clip.format.num_planes)],
+                [0 if i == planes[0] else i for i in range(clip.format.num_planes)],
+                clip.format.color_family
+            )
+
         return join([
             _resize2_blur(p, sigma, taps) if i in planes else p
             for i, p in enumerate(split(clip))
         ])
 
-    kernel: BlurMatrixBase[float] = BlurMatrix.GAUSS(  # type: ignore
-        taps, sigma=sigma, mode=mode, scale_value=1.0 if taps > 12 else 1023
+    # Only SQUARE builds the 2D outer product, HV stays a 1D kernel applied separably on each axis
+    kernel = _get_kernel(
+        BlurMatrix.GAUSS, taps, mode, sigma=sigma, scale_value=1.0 if taps > 12 else 1023  # type: ignore[arg-type]
     )
 
     return kernel(clip, planes, **kwargs)
 
 
+@lru_cache(maxsize=64)
+def _min_blur_expr(radius: int, mode_blur: ConvMode, mode_median: ConvMode) -> str:
+    kernel = _get_kernel(BlurMatrix.BINOMIAL, radius, ConvMode.SQUARE if mode_blur == ConvMode.HV else mode_blur)
+
+    # Normalized here rather than through the divisor, the 2D binomial's sum overflows akarin's int32 evaluation
+    blurred, = ExprOp.convolution('x', [w / sum(kernel) for w in kernel], divisor=False, mode=kernel.mode)
+    median, = _median_expr(radius, mode_median)
+
+    return f'{blurred} Y! {median} Z! x Y@ Z@ min Y@ Z@ max clip'
+
+
 def min_blur(
     clip: vs.VideoNode, radius: int | list[int] = 1,
     mode: tuple[ConvMode, ConvMode] = (ConvMode.HV, ConvMode.SQUARE), planes: PlanesT = None,
@@ -205,12 +249,54 @@ def min_blur(
     
     mode_blur, mode_median = normalize_seq(mode, 2)
 
-    blurred = BlurMatrix.BINOMIAL(radius=radius, mode=mode_blur)(clip, planes=planes, **kwargs)
+    if all([
+        complexpr_available, not kwargs, radius > 0, mode_blur.is_spatial,
+        mode_median in (ConvMode.SQUARE, ConvMode.VERTICAL, ConvMode.HORIZONTAL)
+    ]):
+        return norm_expr(clip, _min_blur_expr(radius, mode_blur, mode_median), planes, func=min_blur)
+
+    blurred = _get_kernel(BlurMatrix.BINOMIAL, radius, mode_blur)(clip, planes=planes, **kwargs)
     median = median_blur(clip, radius, mode_median, planes=planes)
 
     return MeanMode.MEDIAN([clip, blurred, median], planes=planes)
 
 
+@lru_cache(maxsize=64)
+def _sbr_expr(radius: int, mode: ConvMode) -> str:
+    """
+    Single pass sbr expression.
+
+    With K the normalized binomial kernel, the difference is (δ - K) * x and the blurred
+    difference is subtracted from it as (δ - K) * (δ - K) * x, so both are direct convolutions of the source.
+    """
+    kernel = _get_kernel(BlurMatrix.BINOMIAL, radius, ConvMode.SQUARE if mode == ConvMode.HV else mode)
+    conv_mode = ConvMode.SQUARE if mode in (ConvMode.HV, ConvMode.SQUARE) else mode
+
+    width = 2 * radius + 1
+    rows = [kernel[i:i + width] for i in range(0, len(kernel), width)] if conv_mode == ConvMode.SQUARE else [kernel]
+
+    ksum = sum(kernel)
+
+    # High pass kernel scaled by ksum, ksum * δ - K
+    high = [[ksum * (i == len(rows) // 2 and j == radius) - w for j, w in enumerate(row)] for i, row in enumerate(rows)]
+
+    high2 = [[0] * (2 * len(high[0]) - 1) for _ in range(2 * len(high) - 1)]
+
+    for i, row_a in enumerate(high):
+        for j, a in enumerate(row_a):
+            for k, row_b in enumerate(high):
+                for m, b in enumerate(row_b):
+                    high2[i + k][j + m] += a * b
+
+    # Normalized here rather than through the divisor, integer weights overflow in akarin's int32 evaluation
+    diff, diff2 = (
+        ExprOp.convolution('x', [w / div for row in hk for w in row], divisor=False, mode=conv_mode)[0]
+        for hk, div in [(high, ksum), (high2, ksum ** 2)]
+    )
+
+    return f'{diff2} D1! {diff} D2! x D1@ D2@ xor 0 D1@ abs D2@ abs < D1@ D2@ ? ? -'
+
+
 def sbr(
     clip: vs.VideoNode, radius: int | list[int] = 1,
     mode: ConvMode = ConvMode.HV, planes: PlanesT = None,
@@ -220,7 +306,16 @@ def sbr(
 
     planes = normalize_planes(clip, planes)
 
-    blur_kernel = BlurMatrix.BINOMIAL(radius=radius, mode=mode)
+    if isinstance(radius, list):
+        return normalize_radius(clip, sbr, radius, planes, mode=mode, **kwargs)
+
+    if not radius:
+        return clip
+
+    if complexpr_available and mode.is_spatial and not kwargs:
+        return norm_expr(clip, _sbr_expr(radius, mode), planes, func=sbr)
+
+    blur_kernel = _get_kernel(BlurMatrix.BINOMIAL, radius, mode)
 
     blurred = blur_kernel(clip, planes=planes, **kwargs)
 
@@ -234,6 +329,81 @@ def sbr(
     )
 
 
+def _median_network(n: int) -> str:
+    """
+    Builds a selection network returning the median of the center pixel and its ``n`` neighbours.
+
+    This is Batcher's odd-even merge sort pruned down to the comparators
+    which contribute to the two middle neighbours, that are then used to clip the center pixel.
+    """
+    size = 1 << (n - 1).bit_length()
+    lo, hi = n // 2 - 1, n // 2
+
+    comparators = list[tuple[int, int]]()
+
+    p = 1
+    while p < size:
+        k = p
+        while k >= 1:
+            for j in range(k % p, size - k, 2 * k):
+                for i in range(min(k, size - j - k)):
+                    a, b = i + j, i + j + k
+
+                    if a // (p * 2) == b // (p * 2) and b < n:
+                        comparators.append((a, b))
+            k //= 2
+        p *= 2
+
+    needed, network = {lo, hi}, list[str]()
+
+    for a, b in reversed(comparators):
+        need_min, need_max = a in needed, b in needed
+
+        if need_min and need_max:
+            network.append(f'M{a}@ M{b}@ min M{a}@ M{b}@ max M{b}! M{a}!')
+        elif need_min:
+            network.append(f'M{a}@ M{b}@ min M{a}!')
+        elif need_max:
+            network.append(f'M{a}@ M{b}@ max M{b}!')
+        else:
+            continue
+
+        needed |= {a, b}
+
+    return ' '.join([
+        *(f'M{i}!' for i in reversed(range(n))), *reversed(network), f'x M{lo}@ M{hi}@ clip'
+    ])
+
+
+_MEDIAN_NETWORKS = {
+    (r, mode): _median_network(n)
+    for r in (1, 2) for mode, n in [
+        (ConvMode.SQUARE, (2 * r + 1) ** 2 - 1), (ConvMode.VERTICAL, 2 * r), (ConvMode.HORIZONTAL, 2 * r)
+    ]
+}
+
+
+@lru_cache(maxsize=64)
+def _median_expr(radius: int, mode: ConvMode) -> tuple[str, ...]:
+    expr_passes = list[str]()
+
+    pass_modes = (ConvMode.VERTICAL, ConvMode.HORIZONTAL) if mode == ConvMode.HV else (mode, )
+
+    for mat, pass_mode in zip(ExprOp.matrix('x', radius, mode, [(0, 0)]), pass_modes):
+        if (network := _MEDIAN_NETWORKS.get((radius, pass_mode))):
+            expr_passes.append(f'{mat} {network}')
+            continue
+
+        rb = len(mat) + 1
+        st = rb - 1
+        sp = rb // 2 - 1
+        dp = st - 2
+
+        expr_passes.append(f"{mat} sort{st} swap{sp} min! swap{sp} max! drop{dp} x min@ max@ clip")
+
+    return tuple(expr_passes)
+
+
 @overload
 def median_blur(
     clip: vs.VideoNode, radius: int = ..., mode: Literal[ConvMode.TEMPORAL] = ..., planes: PlanesT = ...
@@ -269,20 +439,7 @@ def median_blur(
     if (len((rs := set(radius))) == 1 and rs.pop() == 1) and mode == ConvMode.SQUARE:
         return clip.std.Median(planes=planes)
 
-    expr_plane = list[list[str]]()
-
-    for r in radius:
-        expr_passes = list[str]()
-
-        for mat in ExprOp.matrix('x', r, mode, [(0, 0)]):
-            rb = len(mat) + 1
-            st = rb - 1
-            sp = rb // 2 - 1
-            dp = st - 2
-
-            expr_passes.append(f"{mat} sort{st} swap{sp} min! swap{sp} max! drop{dp} x min@ max@ clip")
-
-        expr_plane.append(expr_passes)
+    expr_plane = [_median_expr(r, mode) for r in radius]
 
     for e in zip(*expr_plane):
         clip = norm_expr(clip, e, planes, force_akarin=median_blur)
@@ -317,18 +474,20 @@ def bilateral(
 
     clip = clip.vszip.Bilateral(ref, sigmaS, sigmaR)
 
-    return depth(clip, bits)
+    return depth(clip, bits) if bits > 16 else clip
 
 
 def flux_smooth(
     clip: vs.VideoNode, temporal_threshold: float = 7.0, spatial_threshold: float = 0.0,
     scalep: bool = True, planes: PlanesT = None
 ) -> vs.VideoNode:
-    func = FunctionUtil(clip, flux_smooth, planes)
+    assert check_variable(clip, flux_smooth)
+
+    planes = normalize_planes(clip, planes)
 
     if spatial_threshold:
-        smoothed = func.work_clip.zsmooth.FluxSmoothST(temporal_threshold, spatial_threshold, scalep)
-    else:
-        smoothed = func.work_clip.zsmooth.FluxSmoothT(temporal_threshold, scalep)
+        return clip.zsmooth.FluxSmoothST(
+            temporal_threshold=temporal_threshold, spatial_threshold=spatial_threshold, planes=planes, scalep=scalep
+        )
 
-    return func.return_clip(smoothed)
+    return clip.zsmooth.FluxSmoothT(temporal_threshold=temporal_threshold, planes=planes, scalep=scalep)
@@ -4,10 +4,10 @@ import operator
 
 from enum import auto
 from itertools import accumulate
-from math import ceil, exp, log2, pi, sqrt
+from math import ceil, exp, isqrt, log2, pi, sqrt
 from typing import Any, Iterable, Literal, Self, Sequence, overload
 
-from vsexprtools import ExprList, ExprOp, ExprToken, ExprVars
+from vsexprtools import ExprList, ExprOp, ExprToken, ExprVars, TupleExprList
 from vstools import (
     ConvMode, CustomIntEnum, CustomValueError, KwargsT, Nb, PlanesT, check_variable, core, fallback,
     iterate, shift_clip_multi, to_singleton, vs
@@ -187,10 +187,14 @@ class BlurMatrixBase(list[Nb]):
             if len(self) <= 25 and self.mode != ConvMode.SQUARE and not fp16:
                 return iterate(clip, core.std.Convolution, passes, self, bias, divisor, planes, saturate, self.mode)
 
-            return iterate(
-                clip, ExprOp.convolution("x", self, bias, fallback(divisor, True), saturate, self.mode, **conv_kwargs),
-                passes, planes=planes, **expr_kwargs
-            )
+            if self.is_symmetric and len(self) % 2:
+                expr_conv = self._convolution_symmetric("x", bias, fallback(divisor, True), saturate, **conv_kwargs)
+            else:
+                expr_conv = ExprOp.convolution(
+                    "x", self, bias, fallback(divisor, True), saturate, self.mode, **conv_kwargs
+                )
+
+            return iterate(clip, expr_conv, passes, planes=planes, **expr_kwargs)
 
         if all([
             not fp16,
@@ -306,6 +310,68 @@ class BlurMatrixBase(list[Nb]):
 
         return iterate(clip, lambda x: expr(shift_clip_multi(x, (-r, r)), planes=planes, **expr_kwargs), passes)
 
+    @property
+    def is_symmetric(self) -> bool:
+        """Whether the kernel is symmetric around its center, in which case mirrored taps share their weight."""
+        return all(a == b for a, b in zip(self, reversed(self)))
+
+    def _convolution_symmetric(
+        self, var: str, bias: float | None = None, divisor: float | bool = True, saturate: bool = True,
+        premultiply: float | None = None, multiply: float | None = None, clamp: bool = False
+    ) -> TupleExprList:
+        """
+        Same as ExprOp.convolution, but for symmetric kernels.
+        Each pair of mirrored pixels is summed before being multiplied by their common weight,
+        halving the number of multiplications.
+        """
+        radius = len(self) // 2 if self.mode != ConvMode.SQUARE else isqrt(len(self)) // 2
+        center = len(self) // 2
+
+        output = list[ExprList]()
+
+        for rel_px in ExprOp.matrix(var, radius, self.mode):
+            expr, n_terms = ExprList(), 0
+
+            for i, weight in enumerate(self[:center + 1]):
+                if weight == 0:
+                    continue
+
+                expr.append(rel_px[i] if i == center else [rel_px[i], rel_px[-1 - i], ExprOp.ADD])
+
+                if weight != 1:
+                    expr.append(weight, ExprOp.MUL)
+
+                n_terms += 1
+
+            expr.extend([ExprOp.ADD] * (n_terms - 1))
+
+            # Mirrors ExprOp.convolution's tail, keep in sync with vsexprtools
+            if premultiply is not None:
+                expr.append(premultiply, ExprOp.MUL)
+
+            if divisor is not False:
+                if divisor is True:
+                    divisor = sum(map(float, self))
+
+                if divisor not in {0, 1}:
+                    expr.append(divisor, ExprOp.DIV)
+
+            if bias is not None:
+                expr.append(bias, ExprOp.ADD)
+
+            if not saturate:
+                expr.append(ExprOp.ABS)
+
+            if multiply is not None:
+                expr.append(multiply, ExprOp.MUL)
+
+            if clamp:
+                expr.append(ExprOp.clamp(ExprToken.RangeMin, ExprToken.RangeMax))
+
+            output.append(expr)
+
+        return TupleExprList(output)
+
     def outer(self) -> Self:
         from numpy import outer
 
@@ -74,7 +74,7 @@ def limit_filter(
         return norm_expr(clips, (
             _limit_filter_expr(got_ref, thr, elast, bright_thr, peak, mode),
             _limit_filter_expr(got_ref, thrc, elast, thrc, peak, mode)
-        ))
+        ), planes)
 
     diff = flt.std.MakeDiff(src, planes)
 
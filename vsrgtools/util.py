@@ -59,3 +59,13 @@ def normalize_radius(
         radius_i = radius[0]
 
     return func(clip, **_get_kwargs(radius_i))
+
+
+def _planes_mask(planes: list[int]) -> int:
+    """Bitmask of the given planes, with bit ``i`` set if plane ``i`` is processed."""
+    mask = 0
+
+    for i in planes:
+        mask |= 1 << i
+
+    return mask